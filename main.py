@@ -8,11 +8,15 @@ Run:
 Admin credentials: admin / admin123
 """
 import os
+import re
 import sys
 import json
 import uuid
 import random
+import bisect
 import datetime
+import functools
+import itertools
 from collections import defaultdict
 
 try:
@@ -20,48 +24,298 @@ try:
 except Exception:
     tabulate = None
 
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+try:
+    import ijson
+except Exception:
+    ijson = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pcsv
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except Exception:
+    pa = pcsv = feather = pq = None
+
 BASE_DIR = os.path.dirname(__file__)
 DATA_DIR = os.path.join(BASE_DIR, "data")
 FILES = {
-    "air": "air_quality.json",
+    "air": "air_quality.jsonl",
     "citizens": "citizens.json",
     "pollutants": "pollutants.json",
     "alerts": "alerts.json",
     "guidelines": "guidelines.json",
 }
+ID_KEYS = {
+    "air": "record_id",
+    "citizens": "citizen_id",
+    "pollutants": "pollutant_id",
+    "alerts": "alert_id",
+}
+# gen_id prefix -> data file whose ids it numbers.
+ID_PREFIXES = {"rec": "air", "pol": "pollutants", "alert": "alerts"}
+
+# Files stored as JSON Lines (one compact record per line) so new records can be
+# appended without rewriting the file. The rest are indented JSON lists.
+JSONL_FILES = {"air"}
+# Earlier releases stored these as JSON lists; ensure_data_dir converts them.
+LEGACY_FILES = {"air": "air_quality.json"}
 
 ADMIN_CREDENTIALS = {"username": "admin", "password": "admin123"}
 
-def ensure_data_dir():
+# Streamed bulk uploads are appended to the data file this many records at a time.
+BULK_BATCH_SIZE = 10000
+
+# Set once ensure_data_dir has created the data files, so later calls skip the stats.
+_data_dir_ready = False
+
+def ensure_data_dir(force=False):
+    global _data_dir_ready
+    if _data_dir_ready and not force:
+        return
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
-    for fn in FILES.values():
+    for name, fn in FILES.items():
         path = os.path.join(DATA_DIR, fn)
-        if not os.path.exists(path):
+        if os.path.exists(path):
+            continue
+        legacy = os.path.join(DATA_DIR, LEGACY_FILES.get(name, fn))
+        if name in JSONL_FILES and os.path.exists(legacy):
+            with open(legacy, "rb") as f:
+                try:
+                    data = _loads(f.read())
+                except Exception:
+                    data = []
+            _write_data(name, path, data)
+        elif name in JSONL_FILES:
+            open(path, "wb").close()
+        else:
             with open(path, "w", encoding="utf-8") as f:
                 json.dump([], f, indent=2)
+    _data_dir_ready = True
+
+if orjson:
+    def _loads(raw):
+        return orjson.loads(raw)
+
+    def _dumps(data, compact=False):
+        option = orjson.OPT_NON_STR_KEYS if compact else orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS
+        return orjson.dumps(data, default=str, option=option)
+else:
+    def _loads(raw):
+        return json.loads(raw)
+
+    def _dumps(data, compact=False):
+        if compact:
+            return json.dumps(data, separators=(",", ":"), default=str).encode("utf-8")
+        return json.dumps(data, indent=2, default=str).encode("utf-8")
+
+def _parse_jsonl(raw):
+    """Parse JSON Lines, skipping blank or unreadable lines (e.g. a torn last write)."""
+    data = []
+    for line in raw.splitlines():
+        if not line.strip():
+            continue
+        try:
+            data.append(_loads(line))
+        except Exception:
+            pass
+    return data
+
+def _open_data_file(path, mode):
+    """open() a data file, recreating the data dir if it was removed while running."""
+    try:
+        return open(path, mode)
+    except FileNotFoundError:
+        ensure_data_dir(force=True)
+        return open(path, mode)
+
+def _write_data(name, path, data):
+    with _open_data_file(path, "wb") as f:
+        if name in JSONL_FILES:
+            f.write(b"".join(_dumps(rec, compact=True) + b"\n" for rec in data))
+        else:
+            f.write(_dumps(data))
+
+# Parsed file contents keyed by path: path -> (st_mtime_ns, data).
+# Callers share the cached list, so changes must be persisted with save_json
+# (or append_json for new records).
+_CACHE = {}
+# Indexes over loaded data: (name, kind) -> (data list they were built from, index).
+_INDEX_CACHE = {}
+# gen_id counters: prefix -> (data list they were derived from, [next number]).
+# Unlike the indexes they survive our own writes; only an external change rescans.
+_ID_COUNTERS = {}
 
 def load_json(name):
     ensure_data_dir()
     path = os.path.join(DATA_DIR, FILES[name])
-    with open(path, "r", encoding="utf-8") as f:
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        # Removed since the first check; recreate it like a fresh start would.
+        ensure_data_dir(force=True)
+        mtime = os.stat(path).st_mtime_ns
+    cached = _CACHE.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, "rb") as f:
+        raw = f.read()
+    if name in JSONL_FILES:
+        data = _parse_jsonl(raw)
+    else:
         try:
-            return json.load(f)
+            data = _loads(raw)
         except Exception:
-            return []
+            data = []
+    _CACHE[path] = (mtime, data)
+    return data
 
 def save_json(name, data):
+    """Rewrite the whole file; for JSON Lines files this is also the compaction step."""
     ensure_data_dir()
     path = os.path.join(DATA_DIR, FILES[name])
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, default=str)
+    previous = _CACHE.get(path, (None, None))[1]
+    _write_data(name, path, data)
+    _CACHE[path] = (os.stat(path).st_mtime_ns, data)
+    _drop_indexes(name)
+    _carry_id_counters(name, previous, data)
+
+def append_json(name, records):
+    """Add records to a JSON Lines file by appending lines instead of rewriting it."""
+    data = load_json(name)
+    path = os.path.join(DATA_DIR, FILES[name])
+    _append_lines(path, records)
+    data.extend(records)
+    _CACHE[path] = (os.stat(path).st_mtime_ns, data)
+    _drop_indexes(name)
+    _carry_id_counters(name, data, data, records)
+
+def append_air_stream(records):
+    """Append an iterable of air records in BULK_BATCH_SIZE batches; returns the count.
+
+    Unlike append_json this does not keep the records: the air file is evicted
+    from the cache instead of extended, so a streamed upload's memory does not
+    grow with its size. Missing ids come from one counter taken up front.
+    """
+    counter = _id_counter("rec")
+    path = os.path.join(DATA_DIR, FILES["air"])
+    _CACHE.pop(path, None)
+    _ID_COUNTERS.pop("rec", None)
+    _drop_indexes("air")
+    added = 0
+    records = iter(records)
+    while True:
+        batch = list(itertools.islice(records, BULK_BATCH_SIZE))
+        if not batch:
+            return added
+        counter[0] = max(counter[0], _highest_id("rec", batch) + 1)
+        _append_lines(path, with_record_ids(batch, counter))
+        added += len(batch)
+
+def _append_lines(path, records):
+    lines = b"".join(_dumps(rec, compact=True) + b"\n" for rec in records)
+    with _open_data_file(path, "a+b") as f:
+        # Terminate a torn last line first, so the new records start on their own line.
+        if f.seek(0, os.SEEK_END):
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                lines = b"\n" + lines
+        f.write(lines)
+
+def _drop_indexes(name):
+    for key in [k for k in _INDEX_CACHE if k[0] == name]:
+        del _INDEX_CACHE[key]
+
+def _carry_id_counters(name, previous, data, added=()):
+    """Keep gen_id counters for `name` valid after we wrote `data` to it.
+
+    Only counters derived from the list cached before the write are carried over,
+    advanced past any matching ids in the `added` records; saves only write ids
+    that were loaded or generated, so they need no scan.
+    """
+    for prefix, fname in ID_PREFIXES.items():
+        entry = _ID_COUNTERS.get(prefix)
+        if fname != name or not entry or entry[0] is not previous:
+            continue
+        counter = entry[1]
+        counter[0] = max(counter[0], _highest_id(prefix, added) + 1)
+        _ID_COUNTERS[prefix] = (data, counter)
 
 def gen_id(prefix="id"):
-    return f"{prefix}_{uuid.uuid4().hex[:8]}"
+    if prefix not in ID_PREFIXES:
+        return f"{prefix}_{uuid.uuid4().hex[:8]}"
+    return gen_ids(prefix, 1)[0]
+
+def gen_ids(prefix, count, counter=None):
+    """Reserve `count` consecutive ids like 'rec_0000012c' for a prefix in ID_PREFIXES.
+
+    `counter` overrides the cached one, for callers that manage their own.
+    """
+    if counter is None:
+        counter = _id_counter(prefix)
+    start = counter[0]
+    counter[0] += count
+    return [f"{prefix}_{n:08x}" for n in range(start, start + count)]
+
+def _id_counter(prefix):
+    """Next free number for `prefix`, one past the highest hex id already stored.
+
+    Older ids are 8 random hex digits, so they share this format. The file is
+    scanned once per process and again only after it changes outside the portal.
+    """
+    data = load_json(ID_PREFIXES[prefix])
+    cached = _ID_COUNTERS.get(prefix)
+    if cached and cached[0] is data:
+        return cached[1]
+    counter = [_highest_id(prefix, data) + 1]
+    _ID_COUNTERS[prefix] = (data, counter)
+    return counter
+
+def _highest_id(prefix, records):
+    """Largest n among '<prefix>_<hex n>' ids in `records`, or 0."""
+    key_name = ID_KEYS[ID_PREFIXES[prefix]]
+    pattern = re.compile(re.escape(prefix) + r"_([0-9a-f]+)")
+    highest = 0
+    for item in records:
+        m = pattern.fullmatch(str(item.get(key_name, "")))
+        if m:
+            highest = max(highest, int(m.group(1), 16))
+    return highest
+
+def with_record_ids(records, counter=None):
+    """Give records lacking a record_id one from a single block of new ids."""
+    ids = iter(gen_ids("rec", sum(1 for rec in records if not rec.get("record_id")), counter))
+    return [rec if rec.get("record_id") else {**rec, "record_id": next(ids)} for rec in records]
+
+# Only tables up to this many rows are memoized (pollutants, guidelines, alerts);
+# big listings such as all air records are rendered directly each time.
+GRID_CACHE_MAX_ROWS = 50
+
+@functools.lru_cache(maxsize=32)
+def _render_grid(rows, headers):
+    return tabulate(rows, headers=headers, tablefmt="grid")
 
 def print_table(rows, headers=None):
     if tabulate:
-        print(tabulate(rows, headers=headers, tablefmt="grid"))
+        # Small rendered tables are memoized on their contents, so re-listing
+        # unchanged data skips tabulate; changed data simply misses the cache.
+        key = None
+        if len(rows) <= GRID_CACHE_MAX_ROWS:
+            try:
+                key = (tuple(map(tuple, rows)), tuple(headers or ()))
+                hash(key)
+            except TypeError:  # unhashable cells, e.g. pollutant dicts
+                key = None
+        if key is None:
+            print(tabulate(rows, headers=headers, tablefmt="grid"))
+        else:
+            print(_render_grid(*key))
     else:
         if headers:
             print(" | ".join(headers))
@@ -75,13 +329,80 @@ def safe_float(x, default=0.0):
     except Exception:
         return default
 
-def find_by_id(list_obj, key_name, key_value):
-    for item in list_obj:
-        if item.get(key_name) == key_value:
-            return item
-    return None
+def index_by_id(name, data):
+    """Map each record's id (per ID_KEYS) to the record; first occurrence wins.
+
+    The index is reused while `data` is the same list load_json handed out
+    and has not been saved since.
+    """
+    cached = _INDEX_CACHE.get((name, "id"))
+    if cached and cached[0] is data:
+        return cached[1]
+    key_name = ID_KEYS[name]
+    index = {}
+    for item in data:
+        index.setdefault(item.get(key_name), item)
+    _INDEX_CACHE[(name, "id")] = (data, index)
+    return index
+
+def region_index(air):
+    """Map lowercased region name to that region's air records, sorted by date.
+
+    Cached like index_by_id, so region queries stop rescanning every record.
+    Records whose region is missing or not a string are filed under "", and
+    those whose date is missing or not a string sort first, so one bad imported
+    row cannot break the index; see latest_record for the newest one.
+    """
+    cached = _INDEX_CACHE.get(("air", "region"))
+    if cached and cached[0] is air:
+        return cached[1]
+    index = defaultdict(list)
+    for r in air:
+        index[_region_key(r)].append(r)
+    index = {region: sorted(recs, key=_date_key) for region, recs in index.items()}
+    dates = {region: [_date_key(r) for r in recs] for region, recs in index.items()}
+    _INDEX_CACHE[("air", "region")] = (air, index)
+    _INDEX_CACHE[("air", "region_dates")] = (air, dates)
+    return index
+
+def _region_key(r):
+    region = r.get("region")
+    return region.lower() if isinstance(region, str) else ""
+
+def _date_key(r):
+    date = r.get("date")
+    return date if isinstance(date, str) else ""
+
+def latest_record(air, region):
+    """Newest record for a lowercased region, or None.
+
+    Of several records sharing the newest date, the first in file order wins.
+    """
+    recs = region_index(air).get(region)
+    if not recs:
+        return None
+    dates = region_dates(air)[region]
+    return recs[bisect.bisect_left(dates, dates[-1])]
+
+def region_dates(air):
+    """Sorted ISO dates per lowercased region, parallel to region_index(air)."""
+    cached = _INDEX_CACHE.get(("air", "region_dates"))
+    if not (cached and cached[0] is air):
+        region_index(air)
+        cached = _INDEX_CACHE[("air", "region_dates")]
+    return cached[1]
+
+def records_on_date(air, date):
+    """Records for `date` across all regions, found by binary search per region."""
+    index = region_index(air)
+    results = []
+    for region, dates in region_dates(air).items():
+        lo = bisect.bisect_left(dates, date)
+        hi = bisect.bisect_right(dates, date, lo)
+        results.extend(index[region][lo:hi])
+    return results
 
-# Admin functions (same as before)
+# Admin functions
 def admin_login():
     print("Admin login")
     u = input("Username: ").strip()
@@ -98,10 +419,11 @@ def admin_menu():
         print("1. Add Air Quality Record")
         print("2. Update/Delete Air Record")
         print("3. Manage Pollutants")
-        print("4. Upload Bulk Data (JSON/CSV)")
+        print("4. Upload Bulk Data (JSON/CSV/Parquet/Arrow)")
         print("5. Generate Reports")
         print("6. Manage Alerts")
-        print("7. Back to Main Menu")
+        print("7. Export Air Data (Parquet)")
+        print("8. Back to Main Menu")
         ch = input("Choice: ").strip()
         if ch == "1":
             add_air_quality_record()
@@ -116,12 +438,13 @@ def admin_menu():
         elif ch == "6":
             manage_alerts()
         elif ch == "7":
+            export_parquet()
+        elif ch == "8":
             break
         else:
             print("Invalid choice.")
 
 def add_air_quality_record():
-    air = load_json("air")
     pollutants_list = load_json("pollutants")
     print("Add Air Quality Record")
     region = input("Region / City: ").strip()
@@ -144,8 +467,7 @@ def add_air_quality_record():
         "pollutants": pollutant_levels,
         "health_risk": ""
     }
-    air.append(rec)
-    save_json("air", air)
+    append_json("air", [rec])
     print("Record added.")
 
 def update_delete_aq_record():
@@ -158,14 +480,13 @@ def update_delete_aq_record():
     rid = input("Enter record_id to update/delete (blank to cancel): ").strip()
     if not rid:
         return
-    rec = find_by_id(air, "record_id", rid)
+    rec = index_by_id("air", air).get(rid)
     if not rec:
         print("Record not found.")
         return
     action = input("Enter 'u' to update, 'd' to delete, anything else to cancel: ").strip().lower()
     if action == "d":
-        air = [r for r in air if r["record_id"] != rid]
-        save_json("air", air)
+        save_json("air", [r for r in air if r.get("record_id") != rid])
         print("Deleted.")
     elif action == "u":
         rec["region"] = input(f"Region [{rec['region']}]: ").strip() or rec['region']
@@ -198,7 +519,7 @@ def manage_pollutants():
             print("Pollutant added.")
         elif ch == "2":
             pid = input("Pollutant ID to update: ").strip()
-            p = find_by_id(pollutants, "pollutant_id", pid)
+            p = index_by_id("pollutants", pollutants).get(pid)
             if not p:
                 print("Not found.")
                 continue
@@ -211,57 +532,191 @@ def manage_pollutants():
             print("Updated.")
         elif ch == "3":
             pid = input("Pollutant ID to delete: ").strip()
-            pollutants = [x for x in pollutants if x["pollutant_id"] != pid]
-            save_json("pollutants", pollutants)
-            print("Deleted if existed.")
+            if pid not in index_by_id("pollutants", pollutants):
+                print("Not found.")
+                continue
+            save_json("pollutants", [x for x in pollutants if x.get("pollutant_id") != pid])
+            print("Deleted.")
         elif ch == "4":
             break
         else:
             print("Invalid choice.")
 
 def upload_bulk_data():
-    path = input("Enter path to JSON or CSV file: ").strip()
+    path = input("Enter path to JSON, CSV, Parquet or Arrow file: ").strip()
     if not os.path.exists(path):
         print("File not found.")
         return
     ext = os.path.splitext(path)[1].lower()
-    air = load_json("air")
     if ext == ".json":
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        if isinstance(data, list):
-            for rec in data:
-                if "record_id" not in rec:
-                    rec["record_id"] = gen_id("rec")
-                air.append(rec)
-            save_json("air", air)
-            print(f"Imported {len(data)} records.")
-        else:
+        # Check the whole file before appending anything, so a malformed upload
+        # imports nothing and can simply be retried once fixed.
+        try:
+            with open(path, "rb") as f:
+                if ijson is None:
+                    records = list(iter_json_records(f))
+                else:
+                    for _ in iter_json_records(f):
+                        pass
+        except TypeError:
             print("JSON must be a list of records.")
+            return
+        except ValueError as e:
+            reason = str(e).strip().splitlines()[0] if str(e).strip() else "parse error"
+            print(f"Invalid JSON file, nothing imported: {reason}")
+            return
+        if ijson is None:
+            added = append_air_stream(records)
+        else:
+            with open(path, "rb") as f:
+                added = append_air_stream(iter_json_records(f))
+        print(f"Imported {added} records.")
     elif ext == ".csv":
-        import csv
         pollutants = [p["name"] for p in load_json("pollutants")]
-        with open(path, newline="", encoding="utf-8") as cf:
-            reader = csv.DictReader(cf)
-            added = 0
-            for row in reader:
-                rec = {
-                    "record_id": gen_id("rec"),
-                    "region": row.get("region", ""),
-                    "date": row.get("date", str(datetime.date.today())),
-                    "AQI": int(safe_float(row.get("AQI",0))),
-                    "pollutants": {},
-                    "health_risk": row.get("health_risk","")
-                }
-                for pn in pollutants:
-                    if pn in row and row[pn] != "":
-                        rec["pollutants"][pn] = safe_float(row[pn])
-                air.append(rec)
-                added += 1
-            save_json("air", air)
-            print(f"Imported {added} rows from CSV.")
+        header, rows = read_csv_rows(path)
+        # Resolve pollutant columns and the default date once, not per row.
+        columns = [pn for pn in pollutants if pn in header]
+        today = str(datetime.date.today())
+        new = [csv_row_to_record(row, columns, today, rid) for row, rid in zip(rows, gen_ids("rec", len(rows)))]
+        append_json("air", new)
+        print(f"Imported {len(new)} rows from CSV.")
+    elif ext in (".parquet", ".arrow", ".feather"):
+        if pa is None:
+            print("Parquet/Arrow import needs the pyarrow package (pip install pyarrow).")
+            return
+        try:
+            table = read_arrow_table(path, ext)
+        except (pa.ArrowException, OSError) as e:
+            print(f"Could not read {path}, nothing imported: {e}")
+            return
+        new = with_record_ids([arrow_row_to_record(row) for row in table.to_pylist()])
+        append_json("air", new)
+        print(f"Imported {len(new)} records.")
+    else:
+        print("Unsupported file type. Use .json, .csv, .parquet or .arrow")
+
+def iter_json_records(f):
+    """Yield the items of the top-level JSON array in binary file `f`.
+
+    With ijson installed the file is streamed, so memory does not grow with the
+    file size; otherwise it is parsed in one go. Raises TypeError if the
+    document is not an array of objects and ValueError if it cannot be parsed
+    (e.g. it is truncated), possibly after some items were yielded.
+    """
+    stream_errors = (ijson.JSONError,) if ijson else ()
+    if ijson is None:
+        data = _loads(f.read())
+        if not isinstance(data, list):
+            raise TypeError("top-level JSON value is not an array")
+        items = data
     else:
-        print("Unsupported file type. Use .json or .csv")
+        try:
+            first = next(ijson.parse(f), None)
+        except ijson.JSONError as e:
+            raise ValueError(str(e))
+        if not first or first[1] != "start_array":
+            raise TypeError("top-level JSON value is not an array")
+        f.seek(0)
+        items = ijson.items(f, "item", use_float=True)
+    try:
+        for rec in items:
+            if not isinstance(rec, dict):
+                raise TypeError("array item is not an object")
+            yield rec
+    except stream_errors as e:
+        raise ValueError(str(e))
+
+def read_arrow_table(path, ext):
+    """Read a Parquet file, or an Arrow IPC file (random-access or stream format)."""
+    if ext == ".parquet":
+        return pq.read_table(path)
+    try:
+        return feather.read_table(path)
+    except pa.ArrowInvalid:
+        with pa.ipc.open_stream(path) as reader:
+            return reader.read_all()
+
+def arrow_row_to_record(row):
+    """Normalize a row read from Parquet/Arrow into the stored air record shape.
+
+    Arrow stores `pollutants` as a struct, so pollutants missing from a record come
+    back as None; they are dropped. Date and timestamp values become YYYY-MM-DD
+    strings; a null date stays None.
+    """
+    rec = {**row, "pollutants": {k: v for k, v in (row.get("pollutants") or {}).items() if v is not None}}
+    date = rec.get("date")
+    if isinstance(date, datetime.datetime):
+        rec["date"] = date.date().isoformat()
+    elif isinstance(date, datetime.date):
+        rec["date"] = date.isoformat()
+    return rec
+
+def export_parquet():
+    if pa is None:
+        print("Parquet export needs the pyarrow package (pip install pyarrow).")
+        return
+    air = load_json("air")
+    if not air:
+        print("No air quality records available.")
+        return
+    path = input("Output file [air_quality.parquet]: ").strip() or "air_quality.parquet"
+    try:
+        # Table.from_pylist takes its columns from the first record only; inferring
+        # a struct over all records keeps keys that only some records have.
+        table = pa.Table.from_batches([pa.RecordBatch.from_struct_array(pa.array(air))])
+        pq.write_table(table, path)
+    except (pa.ArrowException, OSError) as e:
+        print(f"Export failed: {e}")
+        return
+    print(f"Exported {len(air)} records to {path}.")
+
+def read_csv_rows(path):
+    """Return (header, rows) for a CSV file, each row a dict of column -> string.
+
+    Uses pyarrow's multi-threaded reader when installed, with every column read
+    as text so rows look the same as csv.DictReader's. Files pyarrow rejects
+    (e.g. rows with missing fields) fall back to csv.DictReader.
+    """
+    import csv
+    if pa is not None:
+        with open(path, newline="", encoding="utf-8-sig") as cf:
+            header = next(csv.reader(cf), [])
+        try:
+            table = pcsv.read_csv(
+                path,
+                read_options=pcsv.ReadOptions(use_threads=True, block_size=1 << 20),
+                convert_options=pcsv.ConvertOptions(column_types={h: pa.string() for h in header}),
+            )
+            return table.column_names, table.to_pylist()
+        except pa.ArrowInvalid:
+            pass
+    with open(path, newline="", encoding="utf-8-sig") as cf:
+        reader = csv.DictReader(cf)
+        rows = list(reader)
+        return reader.fieldnames or [], rows
+
+def csv_row_to_record(row, columns, today, record_id):
+    """Build an air record from a CSV row; `columns` are the pollutant columns in the header."""
+    return {
+        "record_id": record_id,
+        "region": row.get("region", ""),
+        "date": row.get("date", today),
+        "AQI": int(safe_float(row.get("AQI",0))),
+        "pollutants": {pn: safe_float(row[pn]) for pn in columns if row[pn] != ""},
+        "health_risk": row.get("health_risk","")
+    }
+
+@functools.lru_cache(maxsize=4096)
+def month_key(date):
+    """'YYYY-MM' for a YYYY-MM-DD date, or the date unchanged if it does not parse.
+
+    Memoized because many records share a date and strptime is slow.
+    """
+    try:
+        d = datetime.datetime.strptime(date, "%Y-%m-%d")
+        return f"{d.year}-{d.month:02d}"
+    except Exception:
+        return date
 
 def generate_reports():
     air = load_json("air")
@@ -271,27 +726,26 @@ def generate_reports():
     print("Report options: 1.Top polluted regions (avg AQI) 2.Monthly trend for a region 3.Alerts summary 4.Back")
     ch = input("Choice: ").strip()
     if ch == "1":
-        region_map = defaultdict(list)
+        totals = defaultdict(lambda: [0, 0])  # region -> [AQI sum, record count]
         for r in air:
-            region_map[r["region"]].append(r.get("AQI",0))
-        rows = [[region, round(sum(vals)/len(vals),1), len(vals)] for region, vals in region_map.items()]
+            t = totals[r["region"]]
+            t[0] += r.get("AQI",0)
+            t[1] += 1
+        rows = [[region, round(total/count,1), count] for region, (total, count) in totals.items()]
         rows.sort(key=lambda x: x[1], reverse=True)
         print_table(rows, headers=["Region", "Average AQI", "Records"])
     elif ch == "2":
         region = input("Region: ").strip()
-        rows = [r for r in air if r["region"].lower() == region.lower()]
+        rows = region_index(air).get(region.lower(), [])
         if not rows:
             print("No data for that region.")
             return
-        monthly = defaultdict(list)
+        monthly = defaultdict(lambda: [0, 0])  # month -> [AQI sum, record count]
         for r in rows:
-            try:
-                d = datetime.datetime.strptime(r["date"], "%Y-%m-%d")
-                key = f"{d.year}-{d.month:02d}"
-            except Exception:
-                key = r["date"]
-            monthly[key].append(r.get("AQI",0))
-        data = sorted([(k, sum(v)/len(v)) for k,v in monthly.items()])
+            t = monthly[month_key(r["date"])]
+            t[0] += r.get("AQI",0)
+            t[1] += 1
+        data = sorted([(k, total/count) for k, (total, count) in monthly.items()])
         print_table(data, headers=["Month", "Avg AQI"])
     elif ch == "3":
         alerts = load_json("alerts")
@@ -317,7 +771,7 @@ def manage_alerts():
         print("Alert issued.")
     elif ch == "2":
         aid = input("Alert ID to withdraw: ").strip()
-        a = find_by_id(alerts, "alert_id", aid)
+        a = index_by_id("alerts", alerts).get(aid)
         if a:
             a["status"] = "withdrawn"
             save_json("alerts", alerts)
@@ -343,7 +797,7 @@ def register_citizen():
 def citizen_login():
     citizens = load_json("citizens")
     cid = input("Enter Citizen ID: ").strip()
-    c = find_by_id(citizens, "citizen_id", cid)
+    c = index_by_id("citizens", citizens).get(cid)
     if c:
         citizen_menu(c)
     else:
@@ -376,17 +830,16 @@ def citizen_menu(citizen):
 
 def view_current_aqi(citizen):
     region = citizen.get("location","")
+    needle = region.lower()
     air = load_json("air")
-    region_records = [r for r in air if r["region"].lower() == region.lower()]
-    if not region_records:
+    r = latest_record(air, needle)
+    if r is None:
         print(f"No AQI data for region: {region}")
         return
-    region_records.sort(key=lambda r: r["date"], reverse=True)
-    r = region_records[0]
     print_table([[r["date"], r["region"], r["AQI"], r.get("pollutants",{})]], headers=["Date","Region","AQI","Pollutants"])
     alerts = load_json("alerts")
     for a in alerts:
-        if a["region"].lower() == region.lower() and a["status"] == "active":
+        if a["status"] == "active" and a["region"].lower() == needle:
             print(f"ALERT: {a['AQI_level']} issued on {a['issue_date']} (id {a['alert_id']})")
 
 def search_historical_data():
@@ -399,20 +852,15 @@ def search_historical_data():
     results = []
     if ch == "1":
         d = input("Date (YYYY-MM-DD): ").strip()
-        results = [r for r in air if r["date"] == d]
+        results = records_on_date(air, d)
     elif ch == "2":
         reg = input("Region: ").strip().lower()
-        results = [r for r in air if r["region"].lower() == reg]
+        results = region_index(air).get(reg, [])
     elif ch == "3":
         pol = input("Pollutant name (e.g. PM2.5): ").strip()
         results = [r for r in air if pol in r.get("pollutants",{})]
     elif ch == "4":
-        latest = {}
-        for r in air:
-            key = r["region"]
-            if key not in latest or r["date"] > latest[key]["date"]:
-                latest[key] = r
-        results = list(latest.values())
+        results = [latest_record(air, reg) for reg in region_index(air)]
     else:
         return
     if not results:
@@ -434,7 +882,7 @@ def access_guidelines():
 
 def manage_profile(citizen):
     citizens = load_json("citizens")
-    found = find_by_id(citizens, "citizen_id", citizen["citizen_id"])
+    found = index_by_id("citizens", citizens).get(citizen["citizen_id"])
     if not found:
         print("Profile not found.")
         return
@@ -476,22 +924,24 @@ def create_sample_data():
 
     cities = ["Delhi","Mumbai","Kolkata","Chennai","Bengaluru","Hyderabad","Ahmedabad","Pune","Lucknow","Jaipur",
               "Bhopal","Visakhapatnam","Surat","Kanpur","Nagpur","Indore","Thane","Agra","Vadodara","Nashik"]
-    air = []
+    dates = [datetime.date(2025,1,day).isoformat() for day in range(1,16)]  # Jan 1-15, 2025
+    randint, uniform = random.randint, random.uniform
+
+    def sample_record(city, date, record_id):
+        aqi = randint(50,400)
+        pm25 = round(aqi * uniform(0.3,0.9),1)
+        pm10 = round(aqi * uniform(0.4,1.0),1)
+        no2 = round(aqi * uniform(0.05,0.25),1)
+        co = round(uniform(0.2,5.0) * (aqi/100.0),2)
+        o3 = round(uniform(10,150) * (aqi/200.0),1)
+        so2 = round(uniform(5,80) * (aqi/200.0),1)
+        return {"record_id": record_id, "region": city, "date": date, "AQI": aqi,
+                "pollutants": {"PM2.5": pm25, "PM10": pm10, "NO2": no2, "CO": co, "O3": o3, "SO2": so2},
+                "health_risk": ""}
+
     random.seed(42)
-    for city in cities:
-        for day in range(1,16):  # Jan 1-15, 2025
-            date = datetime.date(2025,1,day).isoformat()
-            aqi = random.randint(50,400)
-            pm25 = round(aqi * random.uniform(0.3,0.9),1)
-            pm10 = round(aqi * random.uniform(0.4,1.0),1)
-            no2 = round(aqi * random.uniform(0.05,0.25),1)
-            co = round(random.uniform(0.2,5.0) * (aqi/100.0),2)
-            o3 = round(random.uniform(10,150) * (aqi/200.0),1)
-            so2 = round(random.uniform(5,80) * (aqi/200.0),1)
-            rec = {"record_id": gen_id("rec"), "region": city, "date": date, "AQI": aqi,
-                   "pollutants": {"PM2.5": pm25, "PM10": pm10, "NO2": no2, "CO": co, "O3": o3, "SO2": so2},
-                   "health_risk": ""}
-            air.append(rec)
+    ids = iter(gen_ids("rec", len(cities) * len(dates)))
+    air = [sample_record(city, date, next(ids)) for city in cities for date in dates]
     save_json("air", air)
 
     alerts = [
@@ -518,7 +968,7 @@ def main_menu():
         elif ch == "2":
             cid = input("Enter Citizen ID: ").strip()
             citizens = load_json("citizens")
-            c = find_by_id(citizens, "citizen_id", cid)
+            c = index_by_id("citizens", citizens).get(cid)
             if c:
                 citizen_menu(c)
             else: